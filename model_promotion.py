@@ -19,12 +19,12 @@ How to run the code:
 """
 
 import argparse
-import glob
-import json
 import logging
-from dataclasses import dataclass
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from time import sleep
+from time import monotonic, sleep
 from typing import Literal, Optional, Union
 
 import mlflow
@@ -33,7 +33,7 @@ from mlflow.exceptions import MlflowException
 from mlflow.tracking import MlflowClient
 from pydantic import BaseModel, ConfigDict
 
-FORMAT = "%(asctime)s | %(levelname)s | %(name)s - %(process)d | %(message)s"
+FORMAT = "%(asctime)s | %(levelname)s | %(name)s - %(process)d - %(threadName)s | %(message)s"
 logging.basicConfig(format=FORMAT, datefmt="%Y-%m-%d %H:%M:%S", level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -45,21 +45,19 @@ DEV, PRE, PRO = "dev", "pre", "pro"
 CONFIG_PATH = "deploy/models/config"
 ML_PROJECT_1, ML_PROJECT_2, ML_PROJECT_3 = "ad_enrichment", "buyers_embeddings", "sellers_embeddings"
 MLFLOW_TRACKING_URI = "http://127.0.0.1:8080"
+MAX_PROMOTION_WORKERS = 16
+MAX_ALIAS_REMOVAL_WORKERS = 8
+# a promotion thread waits while its challenger aliases are removed, so this is the maximum of concurrent requests
+HTTP_POOL_SIZE = MAX_PROMOTION_WORKERS * MAX_ALIAS_REMOVAL_WORKERS
 
 mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
 
 
-@dataclass
-class Result:
-    """Result class to host success or error message from a call to MLFlow model registry.
-    Args:
-        - `message (str)`: success or error message that we will display to the user.
-        - `error (boolean)`: value is True if call return the intended ressource. False otherwise.
+class PromotionError(RuntimeError):
+    """Raised when a call to the MLFlow model registry does not have the intended effect.
+    The message of the exception is the error message that we will display to the user.
     """
 
-    message: str
-    error: bool
-
 
 class Configuration(BaseModel):
     """Pydantic Basemodel class that validate and load json config file with model to promote.
@@ -80,7 +78,8 @@ class Configuration(BaseModel):
     # Please check: adrs/dataeng/adr_automated_retraining.md
 
     # to silence warnings about model_ being a reserved Pydantic variable name
-    model_config = ConfigDict(protected_namespaces=())
+    # configuration is read only and unknown keys (typos) are rejected
+    model_config = ConfigDict(protected_namespaces=(), frozen=True, extra="forbid")
 
     @classmethod
     def load_model_config(cls, path_config_file: Union[str, Path]) -> "Configuration":
@@ -91,8 +90,8 @@ class Configuration(BaseModel):
             Configuration: configuration as a Pydantic basemodel class
             Raise Pydantic Exception in case of validation errors
         """
-        with open(path_config_file, mode="r") as f:
-            return cls(**json.load(f))
+        data = Path(path_config_file).read_bytes()
+        return cls.model_validate_json(data)
 
 
 class BaselinePromoter:
@@ -128,61 +127,62 @@ class BaselinePromoter:
             logger.debug(model)
             return model
         except MlflowException as mlflow_exception:
-            logger.debug(
-                f"model name:{model_alias}; model_alias:{model_alias}; "
-                f"Exception: {mlflow_exception.serialize_as_json()}"
-            )
+            # only serialize the exception when debug logging is enabled
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "model name:%s; model_alias:%s; Exception: %s",
+                    model_name,
+                    model_alias,
+                    mlflow_exception.serialize_as_json(),
+                )
             return
 
-    def _add_alias_to_model(self, model_name: str, model_version: str, model_alias: str) -> Result:
+    def _add_alias_to_model(self, model_name: str, model_version: str, model_alias: str) -> None:
         """Promote ML model by adding the alias `baseline` to a specific model version.
         Note that this will remove any existing baseline alias.
         Args:
             - `model_version (str)`: version number of the model that will be promoted to baseline
             - `model_alias (literal)`: The alias that will attached to the baseline model: `baseline`
             - `model_name (literal)`: MLFlow registered model name. Possible values are:ML_PROJECT_1, ML_PROJECT_2, ML_PROJECT_3
-        Returns:
-            - Result class
+        Raises:
+            - PromotionError when the alias could not be added
         """
-        sucess_msg = (
-            f"We have SUCESSFULLY added alias: `{model_alias}` to "
-            f"version: `{model_version}` of the model name: `{model_name}`\n"
-        )
-        failure_msg = (
-            f"We FAILED to add alias: `{model_alias}` to version: `{model_version}` of the model name: `{model_name}`\n"
-        )
-
         try:
             # Add baseline alias to model name and version in the model registry
             # Remove an existing baseline alias
             self.client.set_registered_model_alias(name=model_name, alias=model_alias, version=model_version)
-            return Result(error=False, message=sucess_msg)
         except MlflowException as mlflow_exception:
-            failure_msg = f"{failure_msg} Exception: {mlflow_exception.serialize_as_json()}"
+            failure_msg = (
+                f"We FAILED to add alias: `{model_alias}` to version: `{model_version}` of the model name: "
+                f"`{model_name}`\n Exception: {mlflow_exception.serialize_as_json()}"
+            )
             logger.debug(failure_msg)
-            return Result(error=True, message=failure_msg)
+            raise PromotionError(failure_msg) from mlflow_exception
 
-    def _remove_alias_from_model(self, model_name: str, model_alias: str) -> Result:
+    def _remove_alias_from_model(self, model_name: str, model_alias: str) -> None:
         """Delete an alias associated with a registered model.
         Args:
             `model_alias (literal)`: The alias that will attached to the baseline model: `baseline`
             `model_name (literal)`: MLFlow registered model name. Possible values are:ML_PROJECT_1, ML_PROJECT_2, ML_PROJECT_3
-        Returns:
-                Result class
+        Raises:
+                PromotionError when the alias could not be removed
         """
-        sucess_msg = f"We have SUCESSFULLY deleted model alias: `{model_alias}` from model name: `{model_name}`\n"
-        failure_msg = f"We have FAILED to remove model alias: `{model_alias}` from model name: `{model_name}`."
-
         try:
             self.client.delete_registered_model_alias(model_name, model_alias)
-            return Result(error=False, message=sucess_msg)
         except MlflowException as mlflow_exception:
-            msg = f"{failure_msg} Exception: {mlflow_exception.serialize_as_json()}"
+            msg = (
+                f"We have FAILED to remove model alias: `{model_alias}` from model name: `{model_name}`. "
+                f"Exception: {mlflow_exception.serialize_as_json()}"
+            )
             logger.debug(msg)
-            return Result(error=True, message=msg)
+            raise PromotionError(msg) from mlflow_exception
 
     def _remove_challenger_aliases_from_model(
-        self, model_name: str, model_version: str, prefix: str = CHALLENGER_ALIAS_PREFIX
+        self,
+        model_name: str,
+        model_version: str,
+        found_model: Optional[ModelVersion],
+        prefix: str = CHALLENGER_ALIAS_PREFIX,
     ) -> None:
         """Remove all challenger aliases from the model that will be promoted.
         The assumption is that a model that will be promoted to baseline have sucessfully concluded all A/B tests.
@@ -196,80 +196,135 @@ class BaselinePromoter:
         Args:
             `model_name (literal)`: MLFlow registered model name. Possible values are: ML_PROJECT_1, ML_PROJECT_2, ML_PROJECT_3
             `model_version (str)`: version number of the model that will be promoted to baseline
+            `found_model (ModelVersion)`: model that will be promoted, as already fetched from the registry
             `prefix (str)`: Prefix challenger aliases that will be remove from model that will be promoted.
         """
-        # get the model that will be promoted by name and version
-        found_model: ModelVersion = self.client.get_model_version(name=model_name, version=model_version)
-        if found_model and found_model.aliases:
-            for alias in found_model.aliases:
-                if prefix in alias:
-                    logger.info(f"Removing alias:`{alias}` from model: `{model_name}` version:`{model_version}`.")
-                    # remove alias from registered model: model_name
-                    result = self._remove_alias_from_model(model_name=model_name, model_alias=alias)
-                    if not result.error:
-                        logger.info(f"Yes, `{alias}` was removed.")
-                    elif result.error:
-                        logger.error(
-                            f"Warning: we failed to remove alias: {alias} from "
-                            f"model:`{model_name}` version:`{model_version}`."
-                        )
-
-    def _verify_that_baseline_matches_version(self, model_name: str, model_alias: str, model_version: str) -> Result:
+        if not found_model or not found_model.aliases:
+            return
+        challenger_aliases = [alias for alias in found_model.aliases if alias.startswith(prefix)]
+        if not challenger_aliases:
+            return
+
+        def remove(alias: str) -> None:
+            logger.info(f"Removing alias:`{alias}` from model: `{model_name}` version:`{model_version}`.")
+            # remove alias from registered model: model_name
+            self._remove_alias_from_model(model_name=model_name, model_alias=alias)
+
+        # each alias is removed with its own call to the registry, send them concurrently
+        # name the workers after the promotion thread, so their log lines can be traced back to the config file
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_ALIAS_REMOVAL_WORKERS, len(challenger_aliases)),
+            thread_name_prefix=f"{threading.current_thread().name}-alias_removal",
+        ) as executor:
+            futures = {alias: executor.submit(remove, alias) for alias in challenger_aliases}
+        # only registry errors are warnings, any other exception stops the promotion
+        for alias, future in futures.items():
+            try:
+                future.result()
+                logger.info(f"Yes, `{alias}` was removed from model:`{model_name}` version:`{model_version}`.")
+            except PromotionError as promotion_error:
+                logger.error(
+                    f"Warning: we failed to remove alias: {alias} from "
+                    f"model:`{model_name}` version:`{model_version}`. {promotion_error}"
+                )
+
+    def _poll_until_alias_matches(
+        self, model_name: str, model_alias: str, model_version: str, timeout: float = 5.0, initial: float = 0.1
+    ) -> bool:
+        """Wait until the alias points to the model version on the registry and that model version has no challenger
+        aliases left, using an exponential backoff.
+        There is a small delay between adding or removing an alias and that change being visible on the registry.
+        Args:
+        - `model_name (literal)`: MLFlow registered model name. Possible values are: ML_PROJECT_1, ML_PROJECT_2, ML_PROJECT_3
+        - `model_alias (literal)`: The alias that will attached to the baseline model: `baseline`
+        - `model_version (str)`: version number of the model that will be promoted to baseline
+        - `timeout (float)`: maximum number of seconds we wait for the alias to be visible
+        - `initial (float)`: number of seconds we wait after the first unsuccessful check, doubled up to 1 second
+        Returns:
+            True if the alias points to the model version without challenger aliases before the timeout. False otherwise.
+        """
+        deadline = monotonic() + timeout
+        delay = initial
+        while True:
+            found_model: Optional[ModelVersion] = self._get_model_by_alias(
+                model_name=model_name, model_alias=model_alias
+            )
+            if (
+                found_model
+                and found_model.version == model_version
+                and not any(alias.startswith(CHALLENGER_ALIAS_PREFIX) for alias in found_model.aliases)
+            ):
+                return True
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return False
+            sleep(min(delay, remaining))
+            delay = min(delay * 2, 1.0)
+
+    def _verify_that_baseline_matches_version(self, model_name: str, model_alias: str, model_version: str) -> None:
         """Verification step: Does the baseline model version matches version in configuration file ?
         Args:
         - `model_alias (literal)`: The alias that will attached to the baseline model: `baseline`
         - `model_name (literal)`: MLFlow registered model name. Possible values are: ML_PROJECT_1, ML_PROJECT_2, ML_PROJECT_3
         - `model_version (str)`: version number of the model that will be promoted to baseline
-        Returns:
-            Result class
+        Raises:
+            PromotionError when the baseline model does not have the correct version or still has challenger aliases
         TODO: We should decide if we throw an exceptio when if baseline model still have challenger alias.
         """
         found_model: Optional[ModelVersion] = self._get_model_by_alias(model_name=model_name, model_alias=model_alias)
         if not found_model:
             failure_msg = f"Weird, no baseline model was not found on the registry for model name: {model_name}"
             logger.debug(failure_msg)
-            return Result(message=failure_msg, error=True)
+            raise PromotionError(failure_msg)
         # check if new baseline model version has no challenger aliases
-        # turn list of aliases into string and check for prefix string `challenger`
-        challenger_aliases = [alias for alias in found_model.aliases if CHALLENGER_ALIAS_PREFIX in alias]
-        has_challenger_aliases = True if len(challenger_aliases) > 0 else False
+        # check for aliases starting with the prefix string `challenger`
+        has_challenger_aliases = any(alias.startswith(CHALLENGER_ALIAS_PREFIX) for alias in found_model.aliases)
 
         message = f"model name: `{model_name}`; model version: `{model_version}`; model alias: `{model_alias}`"
         # check if baseline model version has the correct version and no challenger aliases
         if found_model and found_model.version == model_version and not has_challenger_aliases:
-            sucess_msg = f"We have SUCESSFULLY verified that the baseline model has the correct version. {message}"
-            logger.debug(sucess_msg)
-            return Result(message=sucess_msg, error=False)
+            logger.debug("We have SUCESSFULLY verified that the baseline model has the correct version. %s", message)
+            return
 
         elif found_model and found_model.version == model_version and has_challenger_aliases:
+            challenger_aliases = [alias for alias in found_model.aliases if alias.startswith(CHALLENGER_ALIAS_PREFIX)]
             failure_msg = (
                 f"WARNING: Baseline model still have some challengers aliases: {challenger_aliases}. Check: {message}."
             )
             logger.error(failure_msg)
-            return Result(message=failure_msg, error=True)
+            raise PromotionError(failure_msg)
         else:
             failure_msg = (
                 f"We FAILED to verify that the baseline model has the correct model version. Please check: {message}.\n"
             )
             logger.error(failure_msg)
-            return Result(message=failure_msg, error=True)
+            raise PromotionError(failure_msg)
 
     def start_model_promotion(self):
         """entry function that start model promotion mentioned in the config file"""
 
-        # variable to keep the current baseline model, to provide instruction on how to rollback in case of error
-        current_baseline_version: Optional[ModelVersion] = self._get_model_by_alias(
-            model_name=self.model_name, model_alias=BASELINE_ALIAS
-        )
         # variable to keep the current challenger model, to provide instruction on how to rollback in case of error
         current_challenger_version: Optional[ModelVersion] = self.client.get_model_version(
             name=self.model_name, version=self.model_version
         )
-        # 0. check if the combination of model name, model alias and model version exist already on the registry
-        # if True, nothing more to do, the correct model version is already the baseline else proceed with promotion
-        found_model: Optional[ModelVersion] = self._get_model_by_alias(
-            model_name=self.model_name, model_alias=self.model_alias
+        # 0. check if the model version is already the baseline without any challenger aliases left
+        # if True, nothing more to do: this is typically a re-run of a pipeline that already promoted the model
+        aliases = current_challenger_version.aliases if current_challenger_version else []
+        if BASELINE_ALIAS in aliases and not any(alias.startswith(CHALLENGER_ALIAS_PREFIX) for alias in aliases):
+            logger.info(
+                f"Model: `{self.model_name}` version:`{self.model_version}` is already the `{BASELINE_ALIAS}` "
+                "and has no challenger aliases left. No changes needed.\n"
+            )
+            return
+
+        # variable to keep the current baseline model, to provide instruction on how to rollback in case of error
+        current_baseline_version: Optional[ModelVersion] = self._get_model_by_alias(
+            model_name=self.model_name, model_alias=BASELINE_ALIAS
         )
+        # check if the combination of model name, model alias and model version exist already on the registry
+        # if True, nothing more to do, the correct model version is already the baseline else proceed with promotion
+        # model_alias is always the baseline alias, so the current baseline model is the one we are looking for
+        found_model: Optional[ModelVersion] = current_baseline_version
         if found_model and found_model.version == self.model_version:
             logger.info(
                 f"Model alias: `{self.model_alias}` for model: `{self.model_name}`and "
@@ -280,7 +335,9 @@ class BaselinePromoter:
         # 1. Remove existing challenger aliases from the model version that will be promoted
         # if we are promoting a model to baseline, it means that it loose the challenger status
         # we will remove all chalenger aliases including: challenger_ar, challenger_experiment_name
-        self._remove_challenger_aliases_from_model(model_name=self.model_name, model_version=self.model_version)
+        self._remove_challenger_aliases_from_model(
+            model_name=self.model_name, model_version=self.model_version, found_model=current_challenger_version
+        )
 
         # 2. Promote model version (in var model_version) to baseline
         # 2.a add baseline alias to that specific version
@@ -288,42 +345,43 @@ class BaselinePromoter:
             f"Promoting model: {self.model_name} with version: {self.model_version} "
             f"to: `{self.model_alias}` on `{self.env}` environment."
         )
-        adding: Result = self._add_alias_to_model(
-            model_name=self.model_name, model_version=self.model_version, model_alias=self.model_alias
-        )
-        if adding.error:
-            logger.error(
-                f"We failed to add alias: `{self.model_alias}` to model: "
-                f"{self.model_name} - {self.model_version} on `{self.env}` environment.\n"
+        try:
+            self._add_alias_to_model(
+                model_name=self.model_name, model_version=self.model_version, model_alias=self.model_alias
             )
-        else:
             logger.info(
                 f"Hoera, promoting model: {self.model_name} - {self.model_version} "
                 f"to: `{self.model_alias}` was succesfull."
             )
 
-        # 2.b verify if the baseline alias was really added to the correct model version
-        # There is a small delay between adding an alias and checking if that alias actually exist.
-        # need to sleep and account for that delay.
-        sleep(5)
-        verification: Result = self._verify_that_baseline_matches_version(
-            model_name=self.model_name, model_alias=self.model_alias, model_version=self.model_version
-        )
-        if verification.error:
-            logger.error(f"{verification.message}.\n")
+            # 2.b verify if the baseline alias was really added to the correct model version
+            # There is a small delay between adding an alias and checking if that alias actually exist.
+            # poll the registry until the alias is visible, then run the final verification once.
+            if not self._poll_until_alias_matches(
+                model_name=self.model_name, model_alias=self.model_alias, model_version=self.model_version
+            ):
+                logger.warning(
+                    f"Alias: `{self.model_alias}` of model: {self.model_name} - {self.model_version} "
+                    "is still not up to date on the registry, verifying anyway."
+                )
+            self._verify_that_baseline_matches_version(
+                model_name=self.model_name, model_alias=self.model_alias, model_version=self.model_version
+            )
+        except PromotionError as promotion_error:
+            logger.error(f"{promotion_error}.\n")
             logger.error(
-                "ROLLBACK INSTRUCTION:\nGo to the MLFlow model registry to manually rollback:\n"
+                f"ROLLBACK INSTRUCTION for model: {self.model_name} - {self.model_version} on `{self.env}` environment:\n"
+                "Go to the MLFlow model registry to manually rollback:\n"
                 f" - Make sure the baseline model has the following alias and version: {current_baseline_version}\n"
                 f" - Make sure the challenger model has the following alias and version: {current_challenger_version}\n"
                 f" - Manual rerun this Github Actions pipeline to restart the promotion process.\n"
             )
-            raise RuntimeError(verification.message)
-        else:
-            logger.info(
-                f"Awesome, we have verified that model: {self.model_name} - {self.model_version} "
-                f"has the alias: `{self.model_alias}`."
-            )
-            return
+            raise
+
+        logger.info(
+            f"Awesome, we have verified that model: {self.model_name} - {self.model_version} "
+            f"has the alias: `{self.model_alias}`."
+        )
 
 
 def get_environment_variable_from_input_args() -> Literal[DEV, PRE, PRO]:
@@ -341,17 +399,56 @@ def get_environment_variable_from_input_args() -> Literal[DEV, PRE, PRO]:
     return args.env
 
 
+def _process_one(path_config_file: str, env: Literal[DEV, PRE, PRO], client: MlflowClient) -> None:
+    """Load one json config file and promote the model it mentions.
+    Args:
+        path_config_file (str): full path to json config file
+        env: MLFlow environment where the promotion happens
+        client (MlflowClient): Mlflow client shared by all promotions
+    """
+    logger.info(f"Start proccessing content of config file: {path_config_file}")
+    config: Configuration = Configuration.load_model_config(path_config_file)
+    promoter = BaselinePromoter(client=client, config=config, env=env)
+    promoter.start_model_promotion()
+
+
 def main():
     # extract ennvironment variable in order to load the proper json configuration
     env = get_environment_variable_from_input_args()
+    config_dir = f"{CONFIG_PATH}/{env}"
+    logger.debug("config directory:  %s", config_dir)
+    try:
+        paths = [
+            entry.path
+            for entry in os.scandir(config_dir)
+            if entry.name.endswith(".json") and entry.is_file(follow_symlinks=False)
+        ]
+    except FileNotFoundError:
+        # no config directory for this environment: nothing to promote
+        paths = []
+    if not paths:
+        logger.info(f"No json config file found in directory: {config_dir}")
+        return
+
+    # MLflow sends every request through one pooled `requests.Session` per process, with retries on 429 and 5xx.
+    # Size its connection pool for the concurrent promotions so connections are reused instead of re-opened.
+    os.environ.setdefault("MLFLOW_HTTP_POOL_MAXSIZE", str(HTTP_POOL_SIZE))
     mlflow_client = MlflowClient()
-    path_pattern = f"{CONFIG_PATH}/{env}/*.json"
-    logger.debug(f"path pattern:  {path_pattern}")
-    for path_config_file in glob.iglob(path_pattern):
-        logger.info(f"Start proccessing content of config file: {path_config_file}")
-        config: Configuration = Configuration.load_model_config(path_config_file)
-        promoter = BaselinePromoter(client=mlflow_client, config=config, env=env)
-        promoter.start_model_promotion()
+
+    # each config file is promoted independently and mostly waits on MLflow, run them concurrently
+    # a failing config file must not abort the promotion of the other ones
+    with ThreadPoolExecutor(
+        max_workers=min(MAX_PROMOTION_WORKERS, len(paths)), thread_name_prefix="promotion"
+    ) as executor:
+        futures = {path: executor.submit(_process_one, path, env, mlflow_client) for path in paths}
+    failed_paths = []
+    for path_config_file, future in futures.items():
+        exception = future.exception()
+        if exception:
+            logger.error(f"Promotion failed for config file: {path_config_file}.", exc_info=exception)
+            failed_paths.append(path_config_file)
+    if failed_paths:
+        raise RuntimeError(f"Promotion failed for config files: {failed_paths}")
 
 
 if __name__ == "__main__":
@@ -9,11 +9,11 @@ from pathlib import Path
 from pydantic import ValidationError
 from mlflow.exceptions import MlflowException
 from mlflow.entities.model_registry import ModelVersion
-from model_promotion import Configuration, BaselinePromoter
+from model_promotion import ML_PROJECT_1, Configuration, BaselinePromoter, PromotionError
 
-MODEL_NAME = "finetuned_llama_3_2_for_ad_enrichment"
+MODEL_NAME = ML_PROJECT_1
 
-class ModelPromotionTest:
+class TestModelPromotion:
     @pytest.fixture
     def valid_config(self):
         return {
@@ -33,12 +33,16 @@ class ModelPromotionTest:
             "model_alias": "baseline"
         }
 
+    @pytest.fixture
+    def config(self, valid_config):
+        return Configuration(**valid_config)
+
     @pytest.fixture
     def mock_client(self):
         return MagicMock()
 
-    def test_load_model_config_valid(self, valid_config):
-        path = "test_config_valid.json"
+    def test_load_model_config_valid(self, tmp_path, valid_config):
+        path = tmp_path / "test_config_valid.json"
         with open(path, "w") as f:
             json.dump(valid_config, f)
 
@@ -48,14 +52,23 @@ class ModelPromotionTest:
         assert config.model_name == MODEL_NAME
         assert config.model_alias == "baseline"
 
-    def test_load_model_config_invalid(self, invalid_config):
-        path = "test_config_invalid.json"
+    def test_load_model_config_invalid(self, tmp_path, invalid_config):
+        path = tmp_path / "test_config_invalid.json"
         with open(path, "w") as f:
             json.dump(invalid_config, f)
 
         with pytest.raises(ValidationError):
             Configuration.load_model_config(path)
 
+    def test_load_model_config_extra_key(self, tmp_path, valid_config):
+        path = tmp_path / "test_config_extra_key.json"
+        with open(path, "w") as f:
+            json.dump({**valid_config, "model_versoin": "2"}, f)
+
+        with pytest.raises(ValidationError) as validation_error:
+            Configuration.load_model_config(path)
+        assert [error["type"] for error in validation_error.value.errors()] == ["extra_forbidden"]
+
     def test_baseline_promoter_initialization(self, mock_client, valid_config):
         config = Configuration(**valid_config)
         promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
@@ -66,65 +79,121 @@ class ModelPromotionTest:
         assert promoter.model_alias == "baseline"
         assert promoter.model_name == MODEL_NAME
 
-    def test_get_model_by_alias_success(self, mock_client):
+    def test_get_model_by_alias_success(self, mock_client, config):
         mock_client.get_model_version_by_alias.return_value = ModelVersion("name", "1", "1")
-        promoter = BaselinePromoter(client=mock_client, config=None, env="dev")
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
 
         result = promoter._get_model_by_alias(MODEL_NAME, "baseline")
         assert result is not None
         mock_client.get_model_version_by_alias.assert_called_with(name=MODEL_NAME, alias="baseline")
 
-    def test_get_model_by_alias_failure(self, mock_client):
+    def test_get_model_by_alias_failure(self, mock_client, config):
         mock_client.get_model_version_by_alias.side_effect = MlflowException("Error")
-        promoter = BaselinePromoter(client=mock_client, config=None, env="dev")
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
 
         result = promoter._get_model_by_alias(MODEL_NAME, "baseline")
         assert result is None
 
-    def test_add_alias_to_model_success(self, mock_client):
-        promoter = BaselinePromoter(client=mock_client, config=None, env="dev")
+    def test_add_alias_to_model_success(self, mock_client, config):
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
 
-        result = promoter._add_alias_to_model(MODEL_NAME, "1", "baseline")
-        assert not result.error
+        promoter._add_alias_to_model(MODEL_NAME, "1", "baseline")
         mock_client.set_registered_model_alias.assert_called_with(
             name=MODEL_NAME, alias="baseline", version="1"
         )
 
-    def test_add_alias_to_model_failure(self, mock_client):
+    def test_add_alias_to_model_failure(self, mock_client, config):
         mock_client.set_registered_model_alias.side_effect = MlflowException("Error")
-        promoter = BaselinePromoter(client=mock_client, config=None, env="dev")
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
 
-        result = promoter._add_alias_to_model(MODEL_NAME, "1", "baseline")
-        assert result.error
+        with pytest.raises(PromotionError):
+            promoter._add_alias_to_model(MODEL_NAME, "1", "baseline")
 
-    def test_remove_alias_from_model_success(self, mock_client):
-        promoter = BaselinePromoter(client=mock_client, config=None, env="dev")
+    def test_remove_alias_from_model_success(self, mock_client, config):
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
 
-        result = promoter._remove_alias_from_model(MODEL_NAME, "baseline")
-        assert not result.error
+        promoter._remove_alias_from_model(MODEL_NAME, "baseline")
         mock_client.delete_registered_model_alias.assert_called_with(MODEL_NAME, "baseline")
 
-    def test_remove_alias_from_model_failure(self, mock_client):
+    def test_remove_alias_from_model_failure(self, mock_client, config):
         mock_client.delete_registered_model_alias.side_effect = MlflowException("Error")
-        promoter = BaselinePromoter(client=mock_client, config=None, env="dev")
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
 
-        result = promoter._remove_alias_from_model(MODEL_NAME, "baseline")
-        assert result.error
+        with pytest.raises(PromotionError):
+            promoter._remove_alias_from_model(MODEL_NAME, "baseline")
 
-    def test_verify_that_baseline_matches_version_success(self, mock_client):
+    def test_verify_that_baseline_matches_version_success(self, mock_client, config):
         mock_model_version = ModelVersion("name", "1", "1")
         mock_client.get_model_version_by_alias.return_value = mock_model_version
 
-        promoter = BaselinePromoter(client=mock_client, config=None, env="dev")
-        result = promoter._verify_that_baseline_matches_version(MODEL_NAME, "baseline", "1")
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
+        promoter._verify_that_baseline_matches_version(MODEL_NAME, "baseline", "1")
+
+    def test_verify_that_baseline_matches_version_failure(self, mock_client, config):
+        mock_model_version = ModelVersion("name", "2", "1")
+        mock_client.get_model_version_by_alias.return_value = mock_model_version
+
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
+        with pytest.raises(PromotionError):
+            promoter._verify_that_baseline_matches_version(MODEL_NAME, "baseline", "1")
+
+    def test_poll_until_alias_matches_success(self, mock_client, config):
+        mock_client.get_model_version_by_alias.return_value = ModelVersion("name", "1", "1")
+
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
+        assert promoter._poll_until_alias_matches(MODEL_NAME, "baseline", "1")
+        mock_client.get_model_version_by_alias.assert_called_once()
+
+    def test_poll_until_alias_matches_timeout(self, mock_client, config):
+        mock_client.get_model_version_by_alias.return_value = ModelVersion("name", "2", "1")
+
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
+        assert not promoter._poll_until_alias_matches(MODEL_NAME, "baseline", "1", timeout=0.05, initial=0.01)
+
+    def test_remove_challenger_aliases_from_model(self, mock_client, config):
+        mock_model_version = ModelVersion("name", "1", "1", aliases=["challenger_ar", "challenger_exp", "other"])
+
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
+        promoter._remove_challenger_aliases_from_model(MODEL_NAME, "1", mock_model_version)
 
-        assert not result.error
+        removed = {call.args[1] for call in mock_client.delete_registered_model_alias.call_args_list}
+        assert removed == {"challenger_ar", "challenger_exp"}
+        mock_client.get_model_version.assert_not_called()
 
-    def test_verify_that_baseline_matches_version_failure(self, mock_client):
-        mock_model_version = ModelVersion("name", "1", "2")
+    def test_remove_challenger_aliases_from_model_unexpected_error(self, mock_client, config):
+        mock_model_version = ModelVersion("name", "1", "1", aliases=["challenger_ar"])
+        mock_client.delete_registered_model_alias.side_effect = ConnectionError("Error")
+
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
+        with pytest.raises(ConnectionError):
+            promoter._remove_challenger_aliases_from_model(MODEL_NAME, "1", mock_model_version)
+
+    def test_verify_that_baseline_matches_version_with_challenger_aliases(self, mock_client, config):
+        mock_model_version = ModelVersion("name", "1", "1", aliases=["baseline", "challenger_ar"])
         mock_client.get_model_version_by_alias.return_value = mock_model_version
 
-        promoter = BaselinePromoter(client=mock_client, config=None, env="dev")
-        result = promoter._verify_that_baseline_matches_version(MODEL_NAME, "baseline", "1")
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
+        with pytest.raises(PromotionError):
+            promoter._verify_that_baseline_matches_version(MODEL_NAME, "baseline", "1")
 
-        assert result.error
+    def test_start_model_promotion_already_baseline(self, mock_client, valid_config):
+        mock_client.get_model_version.return_value = ModelVersion("name", "1", "1", aliases=["baseline"])
+        config = Configuration(**valid_config)
+
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
+        promoter.start_model_promotion()
+
+        mock_client.get_model_version.assert_called_once()
+        mock_client.get_model_version_by_alias.assert_not_called()
+        mock_client.delete_registered_model_alias.assert_not_called()
+        mock_client.set_registered_model_alias.assert_not_called()
+
+    def test_poll_until_alias_matches_waits_for_challenger_aliases(self, mock_client, config):
+        mock_client.get_model_version_by_alias.side_effect = [
+            ModelVersion("name", "1", "1", aliases=["baseline", "challenger_ar"]),
+            ModelVersion("name", "1", "1", aliases=["baseline"]),
+        ]
+
+        promoter = BaselinePromoter(client=mock_client, config=config, env="dev")
+        assert promoter._poll_until_alias_matches(MODEL_NAME, "baseline", "1", initial=0.01)
+        assert mock_client.get_model_version_by_alias.call_count == 2